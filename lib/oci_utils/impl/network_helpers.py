@@ -6,20 +6,32 @@
 
 """ Helper module around network information.
 """
+import copy
+import ctypes
+import errno
+import functools
 import ipaddress
+import mmap
 import os
 import os.path
+import selectors
 import socket
 import subprocess
 import signal
 import logging
-from socket import inet_ntoa
+import time
+from socket import inet_aton, inet_ntoa
 from struct import pack
 import re
-import json
+try:
+    # orjson parses the ip -json output a few times faster than the stdlib;
+    # fall back to the stdlib parser when it is not installed
+    import orjson as _json
+except ImportError:
+    import json as _json
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pformat
 from io import StringIO
-from netaddr import IPNetwork
 from oci_utils import where_am_i
 from . import IP_CMD
 from . import sudo_utils
@@ -37,6 +49,7 @@ __all__ = ['is_valid_ip_address',
            'get_network_namespace_infos',
            'get_interfaces',
            'is_ip_reachable',
+           'is_ip_reachable_batch',
            'add_route_table',
            'delete_route_table',
            'network_prefix_to_mask',
@@ -56,11 +69,40 @@ __all__ = ['is_valid_ip_address',
 
 
 _CLASS_NET_DIR = '/sys/class/net'
+_NETNS_DIR = '/var/run/netns'
 _NM_CONF_DIR = '/etc/NetworkManager/conf.d/'
 _ROUTE_TABLES = '/etc/iproute2/rt_tables'
 _ROUTE_TABLES_BCK = _ROUTE_TABLES + '.bck'
 _logger = logging.getLogger('oci-utils.network-helpers')
 
+# setns(2) flag from sched.h: the file descriptor must refer to a network
+# namespace
+_CLONE_NEWNET = 0x40000000
+
+# libc handle, loaded once at import time: _enter_ns runs between fork and
+# exec where a dlopen can deadlock on loader locks held by parent threads
+try:
+    _LIBC = ctypes.CDLL('libc.so.6', use_errno=True)
+except OSError:
+    _LIBC = None
+
+# translation table turning a mac address into a NetworkManager conf name
+_MAC_TRANS = str.maketrans(':', '_')
+
+# rules listed by 'ip rule show' are prefixed with '<priority>:\t'
+_RULE_PREFIX_RE = re.compile(r'\d+:\t')
+
+# cached namespace list as (monotonic expiry timestamp, names); namespaces
+# come and go rarely, a short ttl keeps repeated enumerations cheap
+_namespaces_cache = (0.0, [])
+_NAMESPACES_CACHE_TTL = 1.0
+
+# cached result of get_interfaces() as (monotonic expiry timestamp, data);
+# sysfs does not promise an mtime bump on /sys/class/net when links come and
+# go, so a short ttl bounds the staleness, as for the namespace list
+_interfaces_cache = (0.0, None)
+_INTERFACES_CACHE_TTL = 1.0
+
 
 def is_valid_ip_address(ip_addr):
     """
@@ -197,7 +239,7 @@ def is_network_namespace_exists(name):
        True if exists False otherwise
     """
     _logger.debug('%s', where_am_i())
-    return os.path.exists('/var/run/netns/%s' % name)
+    return os.path.exists('%s/%s' % (_NETNS_DIR, name))
 
 
 def create_network_namespace(name):
@@ -245,15 +287,55 @@ def _get_namespaces():
        list of namespaces
     """
     _logger.debug('%s', where_am_i())
-    _cmd = [IP_CMD, 'netns', 'list']
-    _logger.debug('Executing %s', _cmd)
-    return [name.split(b' ')[0] for name in subprocess.check_output(_cmd).splitlines()]
+    global _namespaces_cache
+    _now = time.monotonic()
+    _expiry, _names = _namespaces_cache
+    if _now >= _expiry:
+        #
+        # the source of truth behind 'ip netns list' is /var/run/netns;
+        # list it directly, no subprocess needed
+        try:
+            _names = os.listdir(_NETNS_DIR)
+        except FileNotFoundError:
+            _names = []
+        _namespaces_cache = (_now + _NAMESPACES_CACHE_TTL, _names)
+    return list(_names)
 
 
+def _enter_ns(namespace):
+    """
+    Move the calling process into a network namespace using setns(2).
+
+    Meant to run as a subprocess preexec_fn; requires CAP_SYS_ADMIN.
+
+    Parameters
+    ----------
+    namespace: str
+        The network namespace name.
+
+    Raises
+    ------
+        OSError: the setns call failed.
+    """
+    if _LIBC is None:
+        raise OSError('libc is not available')
+    fd = os.open('%s/%s' % (_NETNS_DIR, namespace), os.O_RDONLY)
+    try:
+        if _LIBC.setns(fd, _CLONE_NEWNET) != 0:
+            raise OSError(ctypes.get_errno(), 'setns failed for namespace %s' % namespace)
+    finally:
+        os.close(fd)
+
+
+@functools.lru_cache(maxsize=64)
 def _get_link_info_dict(namespace):
     """
-    Get and format the namespace data, ipv4 and ipv6
-    .
+    Get and format the namespace data, ipv4 and ipv6.
+
+    Memoized so repeated queries for the same namespace within one
+    aggregation pass do not refork ip; get_network_namespace_infos clears
+    the cache on entry to avoid staleness across invocations.
+
     Parameters
     ----------
     namespace: str
@@ -264,24 +346,63 @@ def _get_link_info_dict(namespace):
         list: link infos json formatted.
     """
     _logger.debug('%s: %s', where_am_i(), namespace)
-    _cmd = [IP_CMD]
-    if namespace and len(namespace) > 0:
-        _cmd.extend(['-netns', namespace])
-    _cmd.extend(['-details', '-json', 'address', 'show'])
-    _logger.debug('Executing %s', _cmd)
-    link_infos_json = sudo_utils.call_output(_cmd).decode('utf-8')
-    _logger.debug('Result json: %s', link_infos_json)
-    if link_infos_json is None or not link_infos_json.strip():
+    _show_cmd = ['-details', '-json', 'address', 'show']
+    _out = None
+    if namespace and len(namespace) > 0 and os.geteuid() == 0:
+        #
+        # running with enough privileges: enter the namespace with a direct
+        # setns(2) in the forked child, skipping the cost of sudo and of
+        # ip's own netns handling
+        try:
+            _logger.debug('Executing %s in namespace %s', [IP_CMD] + _show_cmd, namespace)
+            _out = subprocess.check_output([IP_CMD] + _show_cmd,
+                                           stderr=subprocess.STDOUT,
+                                           preexec_fn=lambda: _enter_ns(namespace))
+        except (OSError, subprocess.CalledProcessError, subprocess.SubprocessError):
+            _logger.debug('Direct namespace query failed, falling back to ip -netns', exc_info=True)
+            _out = None
+    if _out is None:
+        _cmd = [IP_CMD]
+        if namespace and len(namespace) > 0:
+            _cmd.extend(['-netns', namespace])
+        _cmd.extend(_show_cmd)
+        _logger.debug('Executing %s', _cmd)
+        _out = sudo_utils.call_output(_cmd)
+    if not isinstance(_out, bytes) or len(_out.strip()) == 0:
         return []
+    if _logger.isEnabledFor(logging.DEBUG):
+        _logger.debug('Result json: %s', _out.decode('utf-8'))
     #
-    # the ip command returns a json array, convert to list of dict
-    link_info = json.loads(link_infos_json.strip())
+    # the ip command returns a json array, convert to list of dict;
+    # the parser takes the subprocess output bytes as is, saving a decode pass
+    link_info = _json.loads(_out)
     # _logger.debug(link_info)
     _logger.debug('Result dict:\n%s', pformat(link_info, indent=4))
 
     return link_info
 
 
+def _subnet_address(ip_addr, prefix):
+    """
+    Compute the network address of an address/prefix pair.
+
+    Parameters
+    ----------
+    ip_addr: str
+        The ip address.
+    prefix: int
+        The prefix length.
+
+    Returns
+    -------
+        str: the network address.
+    """
+    if ':' in ip_addr:
+        return str(ipaddress.ip_network('%s/%s' % (ip_addr, prefix), strict=False).network_address)
+    _mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+    return inet_ntoa(pack('>I', int.from_bytes(inet_aton(ip_addr), 'big') & _mask))
+
+
 def _get_address_info(address_info):
     """
     Get required address information.
@@ -307,9 +428,7 @@ def _get_address_info(address_info):
         'broadcast': address_info.get('broadcast'),
         'address_prefix_l': address_info.get('prefixlen'),
         'address': address_info.get('local'),
-        'address_subnet': str(IPNetwork('%s/%s' % (
-            address_info['local'],
-            address_info['prefixlen'])).network)
+        'address_subnet': _subnet_address(address_info['local'], address_info['prefixlen'])
     }
     return addr_info
 
@@ -425,14 +544,17 @@ def get_network_namespace_infos():
 
     """
     _logger.debug('%s', where_am_i())
-    _result = {}
+    # drop link data memoized by a previous invocation
+    _get_link_info_dict.cache_clear()
     _ns_list = _get_namespaces()
     #
     # also gather info from default namespace
-    _ns_list.append(b'')
-
-    for _ns in _ns_list:
-        _result[_ns] = _get_link_infos(_ns)
+    _ns_list.append('')
+    #
+    # entering a namespace is the dominant cost and the wait is I/O bound;
+    # fan out the per-namespace ip calls over a small thread pool
+    with ThreadPoolExecutor(max_workers=min(8, len(_ns_list))) as _executor:
+        _result = dict(zip(_ns_list, _executor.map(_get_link_infos, _ns_list)))
     _logger.debug('Network namespace infos:\n%s', pformat(_result, indent=4))
     return _result
 
@@ -452,65 +574,103 @@ def get_interfaces():
               virtfns : dict of virtual function
     """
     _logger.debug('%s', where_am_i())
+    global _interfaces_cache
+    _expiry, _cached = _interfaces_cache
+    if _cached is not None and time.monotonic() < _expiry:
+        _logger.debug('Returning cached interface information')
+        # hand out a copy so callers cannot poison the cached data
+        return copy.deepcopy(_cached)
+
     ret = {}
 
     pci_id_to_iface = {}
 
-    for n in os.listdir(_CLASS_NET_DIR):
-        physical = True
-        iface = "{}/{}".format(_CLASS_NET_DIR, n)
-        try:
-            link = os.readlink(iface)
-            if link.startswith('../../devices/virtual'):
-                physical = False
-        except OSError:
-            continue
-
-        mac = open('{}/address'.format(iface)).read().strip().lower()
-
-        iface_info = {'physical': physical, 'mac': mac}
-
-        if physical:
-            # Check to see if this is a physical or virtual
-            # function
-            dev = '{}/device'.format(iface)
-
-            pci_id = os.readlink(dev)
-            pci_id = pci_id[pci_id.rfind('/') + 1:]
-
-            pci_id_to_iface[pci_id] = n
-            iface_info['pci'] = pci_id
-
+    #
+    # a single ip invocation provides the mac of every link, saving one
+    # sysfs open/read/close per interface
+    _link_by_name = {}
+    try:
+        _link_by_name = {_o['ifname']: _o
+                         for _o in _json.loads(subprocess.check_output([IP_CMD, '-json', 'link', 'show']))}
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError):
+        _link_by_name = {}
+
+    with os.scandir(_CLASS_NET_DIR) as entries:
+        for entry in entries:
+            # entries in /sys/class/net are symlinks into the device tree
+            if not entry.is_symlink():
+                continue
+            n = entry.name
+            iface = entry.path
             try:
-                phys_id = os.readlink('{}/physfn'.format(dev))[3:]
-                iface_info['physfn'] = phys_id
+                link = os.readlink(iface)
+                physical = not link.startswith('../../devices/virtual')
+
+                _link = _link_by_name.get(n)
+                if _link and _link.get('address'):
+                    mac = _link['address'].lower()
+                else:
+                    # fall back to sysfs when ip did not report this link
+                    fd = os.open('{}/address'.format(iface), os.O_RDONLY)
+                    try:
+                        # a mac address is at most 17 characters plus a newline
+                        mac = os.read(fd, 32).decode().strip().lower()
+                    finally:
+                        os.close(fd)
             except OSError:
-                # If there is no physical function backing this
-                # interface, then it must itself be one
-                virt_ifaces = {}
-                dirs = os.listdir(dev)
-                for d in dirs:
-                    if not d.startswith('virtfn'):
-                        continue
-
-                    virt_pci_id = os.readlink('{}/{}'.format(dev, d))[3:]
-                    virt_ifaces[int(d[6:])] = {'pci_id': virt_pci_id}
-
-                # TODO: find a better way to get mac addresses for virtual functions
-                for line in subprocess.check_output([IP_CMD, 'link', 'show', n]).splitlines():
-                    line = line.strip().decode()
-                    if not line.startswith('vf '):
-                        continue
-
-                    ents = line.split(' ')
-                    vf_num = int(ents[1])
-                    vf_mac = ents[3][:-1]
-
-                    virt_ifaces[vf_num]['mac'] = vf_mac
-
-                iface_info['virtfns'] = virt_ifaces
+                # the interface went away between the scan and the reads
+                continue
 
-        ret[n] = iface_info
+            iface_info = {'physical': physical, 'mac': mac}
+
+            if physical:
+                # Check to see if this is a physical or virtual
+                # function
+                dev = '{}/device'.format(iface)
+
+                pci_id = os.readlink(dev)
+                pci_id = pci_id[pci_id.rfind('/') + 1:]
+
+                pci_id_to_iface[pci_id] = n
+                iface_info['pci'] = pci_id
+
+                try:
+                    phys_id = os.readlink('{}/physfn'.format(dev))[3:]
+                    iface_info['physfn'] = phys_id
+                except OSError:
+                    # If there is no physical function backing this
+                    # interface, then it must itself be one
+                    virt_ifaces = {}
+                    dirs = os.listdir(dev)
+                    for d in dirs:
+                        if not d.startswith('virtfn'):
+                            continue
+
+                        virt_pci_id = os.readlink('{}/{}'.format(dev, d))[3:]
+                        virt_ifaces[int(d[6:])] = {'pci_id': virt_pci_id}
+
+                    if _link is not None:
+                        # vf macs come structured in the vfinfo_list of the
+                        # one-shot ip -json link show data
+                        for _vf in _link.get('vfinfo_list', []):
+                            if _vf.get('vf') in virt_ifaces and 'address' in _vf:
+                                virt_ifaces[_vf['vf']]['mac'] = _vf['address']
+                    else:
+                        # ip did not report this link; parse the plain output
+                        for line in subprocess.check_output([IP_CMD, 'link', 'show', n]).splitlines():
+                            line = line.strip().decode()
+                            if not line.startswith('vf '):
+                                continue
+
+                            ents = line.split(' ')
+                            vf_num = int(ents[1])
+                            vf_mac = ents[3][:-1]
+
+                            virt_ifaces[vf_num]['mac'] = vf_mac
+
+                    iface_info['virtfns'] = virt_ifaces
+
+            ret[n] = iface_info
 
     # Populate any potentially invalid mac addresses with
     # the correct data
@@ -528,6 +688,8 @@ def get_interfaces():
             except Exception:
                 pass
 
+    _interfaces_cache = (time.monotonic() + _INTERFACES_CACHE_TTL, copy.deepcopy(ret))
+
     return ret
 
 
@@ -551,15 +713,73 @@ def is_ip_reachable(ipaddr, port=3260):
     assert isinstance(ipaddr, str), 'IPaddr must be a valid string [%s]' % str(ipaddr)
     assert (isinstance(port, int) and port > 0), 'Port must be positive value [%s]' % str(port)
 
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    return is_ip_reachable_batch([(ipaddr, port)]).get((ipaddr, port), False)
+
+
+def is_ip_reachable_batch(endpoints, timeout=1.0):
+    """
+    Try to open TCP connections to a set of endpoints in parallel.
+
+    All sockets are created non-blocking and awaited together, so probing
+    N endpoints costs at most one timeout instead of N.
+
+    Parameters
+    ----------
+    endpoints : list
+        The (ip address, port) tuples to probe.
+    timeout : float, optional
+        Overall timeout in seconds for the whole batch.
+
+    Returns
+    -------
+        dict
+            The reachability as bool, indexed by (ip address, port).
+    """
+    _logger.debug('%s: %s', where_am_i(), endpoints)
+    results = {}
+    # pending sockets are tracked by socket object, not by endpoint, so
+    # duplicate endpoints in the input each get their own probe
+    _pending = set()
+    _selector = selectors.DefaultSelector()
     try:
-        s.settimeout(1)
-        s.connect((ipaddr, port))
-        return True
-    except Exception:
-        return False
+        for _endpoint in endpoints:
+            results.setdefault(_endpoint, False)
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setblocking(False)
+            try:
+                _err = s.connect_ex(_endpoint)
+            except OSError:
+                # name resolution failure and alike: endpoint not reachable
+                s.close()
+                continue
+            if _err == 0:
+                results[_endpoint] = True
+                s.close()
+            elif _err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                _selector.register(s, selectors.EVENT_WRITE, _endpoint)
+                _pending.add(s)
+            else:
+                s.close()
+        _deadline = time.monotonic() + timeout
+        while _pending:
+            _left = _deadline - time.monotonic()
+            if _left <= 0:
+                break
+            for _key, _ in _selector.select(_left):
+                #
+                # the connect completed; SO_ERROR tells success from refusal
+                _endpoint = _key.data
+                s = _key.fileobj
+                if s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    results[_endpoint] = True
+                _selector.unregister(s)
+                s.close()
+                _pending.discard(s)
     finally:
-        s.close()
+        for s in _pending:
+            s.close()
+        _selector.close()
+    return results
 
 
 def add_route_table(table_name):
@@ -578,31 +798,40 @@ def add_route_table(table_name):
             True for success or table already exists, False for failure.
     """
     _logger.debug('%s: %s', where_am_i(), table_name)
-    # first , find a free number for the table
-    tables_num = []
-    _all_new_lines = []
-    with open(_ROUTE_TABLES) as f:
-        for line in f.readlines():
-            _all_new_lines.append(line)
-            if len(line.strip()) > 0 and not line.startswith('#'):
-                # trust the format of that file
-                tables_num.append(int(line.split()[0]))
-                # check if table already exits
-                if line.split()[1] == table_name:
-                    _logger.debug('Routing table with name %s already exists', table_name)
-                    return True
-    _new_table_num_to_use = -1
-    for n in range(10, 255):
-        if n not in tables_num:
-            _new_table_num_to_use = n
-            break
+    # walk the file mapped read-only as raw bytes, keeping the used table
+    # numbers in a bitset; the content is ascii, no decode needed
+    _table_name_b = table_name.encode()
+    _used = 0
+    _kept = []
+    with open(_ROUTE_TABLES, 'rb') as f:
+        # an empty file cannot be mapped; nothing to scan then either
+        if os.fstat(f.fileno()).st_size > 0:
+            _mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for line in iter(_mm.readline, b''):
+                    _kept.append(line)
+                    if len(line.strip()) > 0 and not line.startswith(b'#'):
+                        # trust the format of that file
+                        _fields = line.split()
+                        _used |= 1 << int(_fields[0])
+                        # check if table already exits
+                        if _fields[1] == _table_name_b:
+                            _logger.debug('Routing table with name %s already exists', table_name)
+                            return True
+            finally:
+                _mm.close()
+    #
+    # the candidate numbers are 10..254: invert the used set, keep that
+    # window and isolate its lowest set bit
+    _free = ~_used & (((1 << 255) - 1) ^ ((1 << 10) - 1))
+    _new_table_num_to_use = (_free & -_free).bit_length() - 1 if _free else -1
     _logger.debug('New table index : %d', _new_table_num_to_use)
-    _all_new_lines.append('%d\t%s\n' % (_new_table_num_to_use, table_name))
+    _kept.append(b'%d\t%s\n' % (_new_table_num_to_use, _table_name_b))
 
     if sudo_utils.copy_file(_ROUTE_TABLES, _ROUTE_TABLES_BCK) != 0:
         _logger.debug('Cannot backup file [%s] to %s', _ROUTE_TABLES, _ROUTE_TABLES_BCK)
         return False
-    if sudo_utils.write_to_file(_ROUTE_TABLES, ''.join(_all_new_lines)) != 0:
+    if sudo_utils.write_to_file(_ROUTE_TABLES, b''.join(_kept).decode()) != 0:
         _logger.debug('Cannot write new content to  file [%s]', _ROUTE_TABLES)
         sudo_utils.copy_file(_ROUTE_TABLES_BCK, _ROUTE_TABLES)
         return False
@@ -627,21 +856,27 @@ def delete_route_table(table_name):
             True for success, False for failure
     """
     _logger.debug('%s: %s', where_am_i(), table_name)
-    _all_new_lines = []
-    with open(_ROUTE_TABLES) as f:
-        _all_lines = f.readlines()
-        for line in _all_lines:
-            # format is '<index>\t<table name>'
-            _s_l = line.split()
-            if len(_s_l) > 1 and _s_l[1] == table_name:
-                # found the table name , skip this line
-                continue
-            _all_new_lines.append(line)
+    _table_name_b = table_name.encode()
+    _kept = []
+    with open(_ROUTE_TABLES, 'rb') as f:
+        # an empty file cannot be mapped; nothing to scan then either
+        if os.fstat(f.fileno()).st_size > 0:
+            _mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for line in iter(_mm.readline, b''):
+                    # format is '<index>\t<table name>'
+                    _s_l = line.split()
+                    if len(_s_l) > 1 and _s_l[1] == _table_name_b:
+                        # found the table name , skip this line
+                        continue
+                    _kept.append(line)
+            finally:
+                _mm.close()
 
     if sudo_utils.copy_file(_ROUTE_TABLES, _ROUTE_TABLES_BCK) != 0:
         _logger.debug('Cannot backup file [%s] to %s', _ROUTE_TABLES, _ROUTE_TABLES_BCK)
         return False
-    if sudo_utils.write_to_file(_ROUTE_TABLES, ''.join(_all_new_lines)) != 0:
+    if sudo_utils.write_to_file(_ROUTE_TABLES, b''.join(_kept).decode()) != 0:
         _logger.debug('Cannot write new content to  file [%s]', _ROUTE_TABLES)
         sudo_utils.copy_file(_ROUTE_TABLES_BCK, _ROUTE_TABLES)
         return False
@@ -649,10 +884,14 @@ def delete_route_table(table_name):
     return True
 
 
+@functools.lru_cache(maxsize=33)
 def network_prefix_to_mask(prefix):
     """
     Converts an ipv4 prefix to a netmask address
 
+    There are only 33 possible prefixes, cache them all; repeat calls
+    become a plain dict lookup.
+
     Parameters
     ----------
        prefix: int
@@ -663,8 +902,31 @@ def network_prefix_to_mask(prefix):
        network_prefix_to_mask(22) -> '255.255.252.0'
     """
     _logger.debug('%s: %s', where_am_i(), prefix)
-    bits = 0xffffffff ^ (1 << 32 - prefix) - 1
-    return inet_ntoa(pack('>I', bits))
+    return inet_ntoa(pack('>I', (0xffffffff << (32 - prefix)) & 0xffffffff))
+
+
+def _ip_batch_delete(ip_opts, delete_cmds):
+    """
+    Run a set of ip(8) delete commands in a single 'ip -batch' process.
+
+    Parameters
+    ----------
+    ip_opts: list
+        Version options for the ip command (e.g. ['-4']).
+    delete_cmds: list
+        The ip subcommands, one per entry (e.g. 'route del ...').
+
+    Returns
+    -------
+        bool
+            True when the whole batch succeeded, False otherwise.
+    """
+    _logger.debug('%s: %s', where_am_i(), delete_cmds)
+    if not delete_cmds:
+        return True
+    _cmd = [IP_CMD] + ip_opts + ['-batch', '-']
+    _batch = '\n'.join(delete_cmds) + '\n'
+    return sudo_utils.call_with_input(_cmd, _batch.encode()) == 0
 
 
 def remove_static_ip_route4(link_name):
@@ -684,13 +946,16 @@ def remove_static_ip_route4(link_name):
     _lines = []
     try:
 
-        _lines = subprocess.check_output([IP_CMD, '-4', 'route', 'show', 'dev', link_name]).splitlines()
+        _lines = subprocess.check_output([IP_CMD, '-4', 'route', 'show', 'dev', link_name], text=True).splitlines()
     except subprocess.CalledProcessError:
         pass
     _logger.debug('Routes found [%s]', _lines)
+    if _ip_batch_delete(['-4'], ['route del %s' % _line.strip() for _line in _lines]):
+        return
+    # the batch failed; fall back to one process per route
     for _line in _lines:
         _command = [IP_CMD, '-4', 'route', 'del']
-        _command.extend(_line.decode().strip().split(' '))
+        _command.extend(_line.strip().split(' '))
         _out = sudo_utils.call_output(_command)
         if _out is not None and len(_out) > 0:
             _logger.warning('Removal of ipv4 route (%s) failed', _line)
@@ -712,13 +977,16 @@ def remove_static_ip_route6(link_name):
     _logger.debug('Looking for ipv6 routes for dev=%s', link_name)
     _lines = []
     try:
-        _lines = subprocess.check_output([IP_CMD, '-6', 'route', 'show', 'dev', link_name]).splitlines()
+        _lines = subprocess.check_output([IP_CMD, '-6', 'route', 'show', 'dev', link_name], text=True).splitlines()
     except subprocess.CalledProcessError:
         pass
     _logger.debug('Routes found [%s]', _lines)
+    if _ip_batch_delete(['-6'], ['route del %s' % _line.strip() for _line in _lines]):
+        return
+    # the batch failed; fall back to one process per route
     for _line in _lines:
         _command = [IP_CMD, '-6', 'route', 'del']
-        _command.extend(_line.decode().strip().split(' '))
+        _command.extend(_line.strip().split(' '))
         _out = sudo_utils.call_output(_command)
         if _out is not None and len(_out) > 0:
             _logger.warning('Removal of ipv6 route (%s) failed', _line)
@@ -820,7 +1088,7 @@ def _compute_nm_conf_filename(mac):
       - add .conf at the end
     """
     _logger.debug('%s: %s', where_am_i(), mac)
-    return "%s.conf" % mac.replace(':', '_').upper()
+    return f"{mac.translate(_MAC_TRANS).upper()}.conf"
 
 
 def remove_mac_from_nm(mac):
@@ -922,7 +1190,7 @@ def remove_ip_rules(ip_addr):
     try:
         _cmd.extend(['rule', 'list'])
         _logger.debug('Executing %s', _cmd)
-        _lines = subprocess.check_output(_cmd).decode('utf-8').splitlines()
+        _lines = subprocess.check_output(_cmd, text=True).splitlines()
     except subprocess.CalledProcessError:
         pass
     # for any line (i.e rules) if the ip is involved , grab the priority number
@@ -932,7 +1200,10 @@ def remove_ip_rules(ip_addr):
     # lines are like ''0:\tfrom all lookup local '' : take first item and remove trailing ':'
     prio_nums = [_l.split()[0][:-1] for _l in _matches]
     _logger.debug('prio_nums %s', prio_nums)
-    # now del all rules by priority number
+    # now del all rules by priority number, all in one ip process
+    if _ip_batch_delete(ip_cmd_version(ip_addr)[1:], ['rule del pref %s' % _p for _p in prio_nums]):
+        return
+    # the batch failed; fall back to one process per rule
     for prio_num in prio_nums:
         _cmd = ip_cmd_version(ip_addr)
         _cmd.extend(['rule', 'del', 'pref', prio_num])
@@ -963,19 +1234,23 @@ def remove_static_ip_rules46(link_name, ipversion):
 
     ipcmd = [IP_CMD, '-%d' % ipversion]
     try:
-        _cmd = [ipcmd, 'rule', 'show', 'lookup', link_name]
+        _cmd = ipcmd + ['rule', 'show', 'lookup', link_name]
         _logger.debug('Executing [%s]', _cmd)
-        _lines = subprocess.check_output(_cmd).splitlines()
+        _lines = subprocess.check_output(_cmd, text=True).splitlines()
     except subprocess.CalledProcessError:
         pass
     _logger.debug('Rules found [%s]', _lines)
 
-    for _line in _lines:
-        _command = [ipcmd, 'rule', 'del']
-        # all line listed are like '<rule number>:\t<rule as string> '
-        # when underlying device is down (i.e. virtual network is down)
-        # the command append '[detached]' we have to remove this
-        _command.extend(re.compile(r'\d:\t').split(_line.decode().strip())[1].replace('[detached] ', '').split(' '))
+    # all line listed are like '<rule number>:\t<rule as string> '
+    # when underlying device is down (i.e. virtual network is down)
+    # the command append '[detached]' we have to remove this
+    _rules = [_RULE_PREFIX_RE.split(_line.strip(), maxsplit=1)[1].replace('[detached] ', '')
+              for _line in _lines]
+    if _ip_batch_delete(['-%d' % ipversion], ['rule del %s' % _rule for _rule in _rules]):
+        return
+    # the batch failed; fall back to one process per rule
+    for _rule in _rules:
+        _command = ipcmd + ['rule', 'del'] + _rule.split(' ')
         _out = sudo_utils.call_output(_command)
         if _out is not None and len(_out) > 0:
             _logger.warning('Cannot delete rule [%s]: %s', ' '.join(_command), str(_out))
@@ -1117,6 +1392,39 @@ def remove_firewall_rule(*args):
     return 0, ''
 
 
+def _get_namespace_pids(namespace):
+    """
+    Find the pids of the processes running within a network namespace.
+
+    The namespace of a process is exposed as /proc/<pid>/ns/net; a process
+    is a member when that inode matches the bind mount under
+    /var/run/netns.  This is what 'ip netns pids' does, without the fork.
+
+    Parameters
+    ----------
+        namespace : the namespace name as str
+    Returns
+    -------
+        list: the member pids as int (can be empty)
+    """
+    _logger.debug('%s: %s', where_am_i(), namespace)
+    try:
+        _ns_inode = os.stat('%s/%s' % (_NETNS_DIR, namespace)).st_ino
+    except OSError:
+        return []
+    _pids = []
+    for _pid in os.listdir('/proc'):
+        if not _pid.isdigit():
+            continue
+        try:
+            if os.stat('/proc/%s/ns/net' % _pid).st_ino == _ns_inode:
+                _pids.append(int(_pid))
+        except OSError:
+            # process exited meanwhile or is not ours to inspect
+            continue
+    return _pids
+
+
 def kill_processes_in_namespace(namespace):
     """
     Kills remaining process within a network namespace
@@ -1129,11 +1437,8 @@ def kill_processes_in_namespace(namespace):
         None
     """
     _logger.debug('%s: %s', where_am_i(), namespace)
-    _out = sudo_utils.call_output([IP_CMD, 'netns', 'pids', namespace])
-    # one pid per line
-    if _out:
-        for pid in _out.splitlines():
-            try:
-                os.kill(int(pid), signal.SIGKILL)
-            except (ValueError, OSError) as e:
-                _logger.warning('Cannot terminate [%s]: %s ', pid, str(e))
+    for pid in _get_namespace_pids(namespace):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError as e:
+            _logger.warning('Cannot terminate [%s]: %s ', pid, str(e))
@@ -12,7 +12,8 @@ import subprocess
 
 from . import (SUDO_CMD, CAT_CMD, RM_CMD, SH_CMD, CP_CMD, TOUCH_CMD, CHMOD_CMD, MKDIR_CMD)
 
-__all__ = ['call', 'call_output', 'execute', 'call_popen_output', 'delete_file', 'copy_file', 'write_to_file']
+__all__ = ['call', 'call_output', 'call_with_input', 'execute', 'call_popen_output',
+           'delete_file', 'copy_file', 'write_to_file']
 
 _logger = logging.getLogger('oci-utils.sudo')
 
@@ -123,6 +124,36 @@ def call_output(cmd, log_output=True):
         return None
 
 
+def call_with_input(cmd, input_data, log_output=True):
+    """
+    Execute a command, feeding data to its standard input.
+
+    Parameters
+    ----------
+    cmd: list
+        Command line as list of strings.
+    input_data: bytes
+        The data to write to the command standard input.
+    log_output: bool
+        Write error messages to logfile if set.
+
+    Returns
+    -------
+        int
+            The command return code.
+    """
+    _c = _prepare_command(cmd)
+    try:
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('Executing [%s]', _c)
+        cp = subprocess.run(_c, input=input_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+        if cp.returncode != 0 and log_output:
+            _logger.debug("Execution failed: ec=%s, output=[%s], stderr=[%s] ", cp.returncode, cp.stdout, cp.stderr)
+        return cp.returncode
+    except OSError:
+        return 404
+
+
 def call_popen_output(cmd, log_output=True):
     """
     Executes a command.